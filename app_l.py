@@ -1,16 +1,27 @@
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
 import json
+import logging
 import os
-import requests
-from pypdf import PdfReader # Corrected import based on common usage
+import threading
 import streamlit as st
 from dotenv import load_dotenv
 import traceback # For detailed error logging
 
 # Import for Hugging Face
-from huggingface_hub import InferenceClient
+from huggingface_hub import AsyncInferenceClient, InferenceClient
 
 # Load environment variables from .env file
 load_dotenv()
+
+# Full tracebacks (frame walking + reading source from disk) are printed only
+# when APP_DEBUG=1; production logs go through the throttleable logger.
+DEBUG = os.getenv("APP_DEBUG") == "1"
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
 HUGGING_FACE_HUB_TOKEN =os.getenv("HUG")
 # Load Hugging Face Token
 
@@ -22,17 +33,108 @@ if not HUGGING_FACE_HUB_TOKEN:
 PUSHOVER_TOKEN = os.getenv("PUSHOVER_TOKEN")
 PUSHOVER_USER = os.getenv("PUSHOVER_USER")
 
+MODEL_ID = "meta-llama/Llama-3.1-8B-Instruct"
+
+@st.cache_resource
+def get_hf_client():
+    """Returns a process-wide InferenceClient shared by every session.
+
+    Building a client per session repeats TLS context setup and loses the
+    underlying keep-alive connection pool, so each cold tab would pay a fresh
+    handshake against the HF inference endpoint. The model is bound at
+    construction so per-call endpoint resolution is done once.
+    """
+    return InferenceClient(model=MODEL_ID, token=HUGGING_FACE_HUB_TOKEN, timeout=60)
+
+@st.cache_resource
+def get_hf_async_client():
+    """Returns the shared AsyncInferenceClient used for the chat path.
+
+    The async client lets a turn await the network stream instead of blocking
+    its script-runner thread, so concurrent tabs overlap their waits.
+    """
+    return AsyncInferenceClient(model=MODEL_ID, token=HUGGING_FACE_HUB_TOKEN, timeout=60)
+
+@st.cache_resource
+def load_linkedin(pdf_path):
+    """Extracts text from the LinkedIn PDF, memoized to a sidecar cache keyed by content hash.
+
+    The PDF is static, so after the first extraction we store the text in
+    me/.cache/<md5>.txt and skip pypdf entirely on later launches.
+    """
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    content_hash = hashlib.md5(pdf_bytes).hexdigest()
+
+    cache_dir = os.path.join(os.path.dirname(pdf_path), ".cache")
+    cache_path = os.path.join(cache_dir, f"{content_hash}.txt")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    # Extraction only runs on a cache miss, so both libraries stay unimported
+    # on the common path. pypdfium2 (native PDFium) is much faster than pypdf;
+    # fall back to pypdf if it's unavailable or chokes on the file.
+    try:
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(pdf_path)
+        linkedin_text = "\n".join(
+            page.get_textpage().get_text_bounded() for page in pdf
+        )
+    except Exception:
+        from pypdf import PdfReader
+
+        reader = PdfReader(pdf_path)
+        parts = []
+        for page in reader.pages:
+            text = page.extract_text()
+            if text:
+                parts.append(text)
+        linkedin_text = "".join(parts)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write(linkedin_text)
+    except OSError:
+        pass  # Cache write failing is not fatal; we just re-extract next launch.
+
+    return linkedin_text
+
+@st.cache_data
+def load_summary(summary_path):
+    """Reads the summary text file, cached across reruns."""
+    with open(summary_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+# Pushover delivery happens off the request path: a small executor plus a
+# shared keep-alive session so notifications never block the chat response.
+# `requests` itself is imported lazily on the first push, keeping it off the
+# Streamlit rerun import path.
+_push_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+_push_session = None
+
+def _get_push_session():
+    global _push_session
+    if _push_session is None:
+        import requests
+        _push_session = requests.Session()
+    return _push_session
+
 def push(text):
-    """Sends a Pushover notification if credentials are available."""
+    """Sends a Pushover notification (fire-and-forget) if credentials are available."""
     if PUSHOVER_TOKEN and PUSHOVER_USER:
         try:
-            requests.post(
+            _push_executor.submit(
+                _get_push_session().post,
                 "https://api.pushover.net/1/messages.json",
                 data={
                     "token": PUSHOVER_TOKEN,
                     "user": PUSHOVER_USER,
                     "message": text,
-                }
+                },
+                timeout=5,
             )
         except Exception as e:
             st.error(f"Error sending Pushover notification: {e}")
@@ -54,17 +156,64 @@ def record_unknown_question(question):
     print(message) # Also print to console
     return {"recorded": "ok", "status": f"Question '{question}' recorded."}
 
+class BatchScheduler:
+    """Coordinates concurrent inference calls from multiple Streamlit sessions.
+
+    The serverless chat-completion endpoint exposes no multi-conversation
+    batch call, and Streamlit already runs each session on its own thread, so
+    requests overlap naturally; what concurrency needs is a cap. Holding a
+    slot around each call keeps at most `max_concurrent` requests in flight,
+    so a burst of tabs queues briefly instead of tripping provider rate
+    limits and timing out.
+    """
+
+    def __init__(self, max_concurrent=8):
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def slot(self):
+        """Context manager reserving one in-flight request slot."""
+        return self._slots
+
+@st.cache_resource
+def get_scheduler():
+    """Returns the process-wide scheduler shared by all sessions."""
+    return BatchScheduler()
+
+# Cap the conversation history sent to the model (12 messages = 6 turns) so
+# input tokens stay bounded as the chat grows. The system prompt is always kept.
+MAX_HISTORY_MESSAGES = 12
+
+# Completed replies kept for repeat questions (FAQs cost a dict lookup, not an
+# inference call). Shared across sessions since Me is a process singleton.
+RESPONSE_CACHE_SIZE = 512
+
+# Token budget for Llama 3.1 requests. We estimate ~4 characters per token
+# (the Llama tokenizer itself is gated and transformers is a heavy pull for a
+# token count); the safety margin absorbs the estimate's error plus message
+# framing overhead.
+MODEL_CONTEXT_WINDOW = 8192
+MAX_NEW_TOKENS = 1024
+_TOKEN_SAFETY_MARGIN = 256
+
+def _estimate_tokens(text):
+    """Rough token count for budget math; intentionally conservative."""
+    return len(text) // 4 + 1
+
 class Me:
     def __init__(self):
         try:
-            self.client = InferenceClient(token=HUGGING_FACE_HUB_TOKEN)
-            self.model_id = "meta-llama/Llama-3.1-8B-Instruct"
+            self.client = get_hf_client()
+            self.aclient = get_hf_async_client()
+            self.scheduler = get_scheduler()
+            self.model_id = MODEL_ID
             # It's good practice to confirm the model is usable, but a direct call here might be slow due to cold starts.
             # For now, we assume it will work if the token and model access are correct.
             #st.info(f"Using Hugging Face model: {self.model_id}")
         except Exception as e:
             st.error(f"Fatal Error: Failed to initialize Hugging Face InferenceClient: {e}")
-            traceback.print_exc()
+            logger.exception("InferenceClient initialization failed")
+            if DEBUG:
+                traceback.print_exc()
             st.stop()
 
         self.name = "Ganesh Neelakanta" # Replace with the actual name if different
@@ -76,12 +225,7 @@ class Me:
             linkedin_pdf_path = os.path.join(script_dir, "me", "Ganesh_Neelakanta_og.pdf")
             summary_txt_path = os.path.join(script_dir, "me", "summary.txt")
 
-            reader = PdfReader(linkedin_pdf_path)
-            self.linkedin = ""
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    self.linkedin += text
+            self.linkedin = load_linkedin(linkedin_pdf_path)
         except FileNotFoundError:
             self.linkedin = "LinkedIn profile information is currently unavailable."
             st.warning(f"Warning: linkedin.pdf not found at {linkedin_pdf_path}. LinkedIn data will be missing.")
@@ -90,8 +234,7 @@ class Me:
             st.error(f"Error processing linkedin.pdf: {e}")
 
         try:
-            with open(summary_txt_path, "r", encoding="utf-8") as f:
-                self.summary = f.read()
+            self.summary = load_summary(summary_txt_path)
         except FileNotFoundError:
             self.summary = "Summary information is currently unavailable."
             st.warning(f"Warning: summary.txt not found at {summary_txt_path}. Summary data will be missing.")
@@ -99,15 +242,45 @@ class Me:
             self.summary = "Error reading summary information."
             st.error(f"Error processing summary.txt: {e}")
 
-    def system_prompt(self):
-        """Generates the system prompt for the LLM."""
-        prompt_text = f"You are a helpful and professional AI assistant representing {self.name}. "
+        # The profile text never changes after init, so build the prompt once
+        # instead of re-concatenating tens of KB on every chat turn.
+        self._system_prompt = self._build_system_prompt()
+        self._system_msg = {"role": "system", "content": self._system_prompt}
+        self._sys_tok_len = _estimate_tokens(self._system_prompt)
+        self._response_cache = collections.OrderedDict()
+        self._response_cache_lock = threading.Lock()
+
+        # Warm the endpoint in the background so the first real question
+        # doesn't pay the serverless cold-start; never block the UI on it.
+        threading.Thread(target=self._warmup, daemon=True).start()
+
+    def _warmup(self):
+        """Fires a tiny completion to load the model before the first user message."""
+        try:
+            self.client.chat_completion(
+                messages=[{"role": "user", "content": "hi"}],
+                max_tokens=1,
+            )
+        except Exception:
+            pass  # Warmup is best-effort; the real request will surface errors.
+
+    def _build_system_prompt(self):
+        """Generates the system prompt for the LLM.
+
+        The large static profile text comes first so that providers with
+        exact-prefix prompt caching can reuse the KV-cache for it across
+        every request; instructions follow after the stable prefix.
+        """
+        prompt_text = f"## Profile for {self.name}\n\n"
+        prompt_text += f"### Summary:\n{self.summary}\n\n"
+        prompt_text += f"### LinkedIn Profile:\n{self.linkedin}\n\n"
+        prompt_text += "## Instructions\n"
+        prompt_text += f"You are a helpful and professional AI assistant representing {self.name}. "
         prompt_text += f"Your goal is to answer questions about {self.name}'s career, background, skills, and experience, based on the provided summary and LinkedIn profile. "
         prompt_text += "Be engaging and aim to provide informative answers. "
         prompt_text += "If you cannot answer a question based on the provided context, clearly state that you don't have the specific information. Do not invent answers. "
         # Tool use instructions are removed for now, as it requires custom implementation.
         # We'll re-introduce simplified tool prompting if needed later.
-        prompt_text += f"\n\n## Summary for {self.name}:\n{self.summary}\n\n## LinkedIn Profile for {self.name}:\n{self.linkedin}\n\n"
         prompt_text += f"Based on this information, please chat with the user, always staying in character as an assistant for {self.name}."
         return prompt_text
 
@@ -129,37 +302,92 @@ class Me:
         else:
             return {"error": f"Unknown tool: {function_name}", "status": "Tool not found."}
 
-    def chat(self, message, history):
-        """Handles a chat interaction with the Hugging Face model."""
-        hf_messages = []
-
-        # System prompt
-        hf_messages.append({"role": "system", "content": self.system_prompt()})
-
-        # Add existing history
-        for chat_item in history:
-            role = chat_item["role"] if chat_item["role"] in ["user", "assistant"] else "user"
-            hf_messages.append({"role": role, "content": chat_item["content"]})
-
-        # Add current user message
+    def _prepare_request(self, message, history):
+        """Computes the cache key, message list and token budget for one turn."""
+        recent_history = history[-MAX_HISTORY_MESSAGES:]
+
+        # Repeat questions (same recent history, same message) are served from
+        # the shared reply cache without touching the inference API.
+        cache_key = hashlib.sha1(
+            (
+                self._system_prompt
+                + json.dumps(recent_history, sort_keys=True)
+                + message
+            ).encode("utf-8")
+        ).hexdigest()
+
+        # Prebuilt system message plus recent history plus the current user
+        # message. History dicts are shared by reference — they come from our
+        # own session code with valid roles, and chat_completion doesn't
+        # mutate them — so the only new allocation per turn is the user dict.
+        hf_messages = [self._system_msg]
+        hf_messages.extend(recent_history)
         hf_messages.append({"role": "user", "content": message})
 
+        # Bound max_tokens by the context room left after the prompt, so long
+        # profiles/histories don't push the request past the model's window.
+        used_tokens = self._sys_tok_len + sum(
+            _estimate_tokens(m["content"]) for m in hf_messages[1:]
+        )
+        max_tokens = min(
+            MAX_NEW_TOKENS,
+            max(1, MODEL_CONTEXT_WINDOW - used_tokens - _TOKEN_SAFETY_MARGIN),
+        )
+
+        return cache_key, hf_messages, max_tokens
+
+    def _cached_reply(self, cache_key):
+        """Returns the cached reply for this key, or None."""
+        with self._response_cache_lock:
+            reply = self._response_cache.get(cache_key)
+            if reply is not None:
+                self._response_cache.move_to_end(cache_key)
+            return reply
+
+    def _store_reply(self, cache_key, reply):
+        """Records a completed reply, evicting the oldest entry past the cap."""
+        with self._response_cache_lock:
+            self._response_cache[cache_key] = reply
+            if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+
+    def chat(self, message, history, message_placeholder=None):
+        """Handles a chat interaction with the Hugging Face model.
+
+        The response is streamed token-by-token; if a Streamlit placeholder is
+        provided, it is progressively updated so the user sees text as soon as
+        the first token arrives instead of waiting for the full generation.
+        """
+        cache_key, hf_messages, max_tokens = self._prepare_request(message, history)
+        cached_reply = self._cached_reply(cache_key)
+        if cached_reply is not None:
+            if message_placeholder is not None:
+                message_placeholder.markdown(cached_reply)
+            return cached_reply
+
         try:
-            # st.text("Sending request to Llama 3.1 model...") # For user feedback
-            response = self.client.chat_completion(
-                model=self.model_id,
-                messages=hf_messages,
-                max_tokens=1024,  # Max new tokens to generate
-                temperature=0.7, # Optional: for creativity
-                # stream=False, # Keep stream=False for now for easier debugging
-            )
-            
             assistant_response_text = ""
-            if response.choices and response.choices[0].message and response.choices[0].message.content:
-                assistant_response_text = response.choices[0].message.content.strip()
-            else:
+            with self.scheduler.slot():
+                for chunk in self.client.chat_completion(
+                    messages=hf_messages,
+                    max_tokens=max_tokens,  # Max new tokens to generate
+                    temperature=0.7, # Optional: for creativity
+                    stream=True, # Stream tokens so time-to-first-token dominates perceived latency
+                ):
+                    if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                        assistant_response_text += chunk.choices[0].delta.content
+                        if message_placeholder is not None:
+                            message_placeholder.markdown(assistant_response_text + "▌")
+
+            assistant_response_text = assistant_response_text.strip()
+            if not assistant_response_text:
                 assistant_response_text = "I received a response, but it was empty."
                 st.warning("Received an empty response from the model.")
+            else:
+                # Only cache real replies; empty/error responses should retry.
+                self._store_reply(cache_key, assistant_response_text)
+            if message_placeholder is not None:
+                message_placeholder.markdown(assistant_response_text)
 
             # --- Tool Calling Section (Placeholder - Needs Major Rework for Llama 3.1) ---
             # Llama 3.1 (especially via basic Inference API) doesn't do structured tool calls like Gemini.
@@ -183,27 +411,112 @@ class Me:
 
         except Exception as e:
             st.error(f"Error during chat with Hugging Face model: {e}")
-            print(f"Full traceback for chat error with Hugging Face model:")
-            traceback.print_exc()
-            return "Sorry, I encountered an error while trying to process your request with the Llama model."
+            logger.exception("chat failed")
+            if DEBUG:
+                traceback.print_exc()
+            fallback_text = "Sorry, I encountered an error while trying to process your request with the Llama model."
+            if message_placeholder is not None:
+                message_placeholder.markdown(fallback_text)
+            return fallback_text
+
+    async def achat(self, message, history, message_placeholder=None):
+        """Async variant of chat() built on AsyncInferenceClient.
+
+        Awaiting the stream frees the session's script-runner thread during
+        network waits, so N concurrent tabs finish in roughly the slowest
+        single latency rather than the sum. Same reply cache, token budget
+        and error behaviour as chat().
+        """
+        cache_key, hf_messages, max_tokens = self._prepare_request(message, history)
+        cached_reply = self._cached_reply(cache_key)
+        if cached_reply is not None:
+            if message_placeholder is not None:
+                message_placeholder.markdown(cached_reply)
+            return cached_reply
+
+        try:
+            assistant_response_text = ""
+            with self.scheduler.slot():
+                stream = await self.aclient.chat_completion(
+                    messages=hf_messages,
+                    max_tokens=max_tokens,
+                    temperature=0.7,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                        assistant_response_text += chunk.choices[0].delta.content
+                        if message_placeholder is not None:
+                            message_placeholder.markdown(assistant_response_text + "▌")
+
+            assistant_response_text = assistant_response_text.strip()
+            if not assistant_response_text:
+                assistant_response_text = "I received a response, but it was empty."
+                st.warning("Received an empty response from the model.")
+            else:
+                self._store_reply(cache_key, assistant_response_text)
+            if message_placeholder is not None:
+                message_placeholder.markdown(assistant_response_text)
+
+            return assistant_response_text
+
+        except Exception as e:
+            st.error(f"Error during chat with Hugging Face model: {e}")
+            logger.exception("achat failed")
+            if DEBUG:
+                traceback.print_exc()
+            fallback_text = "Sorry, I encountered an error while trying to process your request with the Llama model."
+            if message_placeholder is not None:
+                message_placeholder.markdown(fallback_text)
+            return fallback_text
 
 
+@st.cache_resource
+def get_me():
+    """Builds the Me instance once and shares it across all sessions of the process.
+
+    Construction re-reads the profile files and sets up the InferenceClient
+    (including TLS context setup), so it should not run per session.
+    """
+    return Me()
+
 def main():
     """Main function to run the Streamlit chatbot."""
-    
+
 
     try:
-        me = Me()
+        me = get_me()
     except Exception as e:
         st.error(f"Failed to initialize the application: {e}")
-        traceback.print_exc()
+        logger.exception("application initialization failed")
+        if DEBUG:
+            traceback.print_exc()
         st.stop()
 
+    render_header(me)
+    render_chat(me)
+
+@st.fragment
+def render_header(me):
+    """Renders the static title and welcome banner as their own fragment.
+
+    The header has no widgets of its own, so after the chat region became a
+    fragment this only runs on genuine full reruns (new session, refresh) —
+    never per chat turn.
+    """
     st.title(f"{me.name} ( Engineer I - Data Engg & AI)")
 
     st.write(f"Welcome! Ask me about {me.name}'s career, background, skills, and experience. This bot uses Llama 3.1 via Hugging Face Inference API.")
     #st.caption("Note: Tool usage (like saving email) is currently a placeholder and will be re-implemented for Llama 3.1.")
 
+@st.fragment
+def render_chat(me):
+    """Renders the conversation and chat input as a fragment.
+
+    Because the chat input lives inside the fragment, submitting a message
+    reruns only this region instead of the whole script, so the header and
+    the rest of the page are not re-executed on every turn.
+    """
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
@@ -220,16 +533,16 @@ def main():
 
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
-            message_placeholder.markdown("Thinking with Llama 3.1...")
             try:
-                bot_response_text = me.chat(prompt, history_for_bot)
-                message_placeholder.markdown(bot_response_text)
+                bot_response_text = asyncio.run(me.achat(prompt, history_for_bot, message_placeholder))
             except Exception as e:
                 error_message = f"An unexpected error occurred: {e}"
                 message_placeholder.error(error_message)
-                traceback.print_exc()
+                logger.exception("chat turn failed")
+                if DEBUG:
+                    traceback.print_exc()
                 bot_response_text = "I'm having trouble connecting right now. Please try again later."
-        
+
         st.session_state.messages.append({"role": "assistant", "content": bot_response_text})
 
 if __name__ == "__main__":